@@ -1,2 +1,2 @@
-rm logs/main.log
+rm -f logs/main.log logs/main.log.*
 touch logs/main.log
\ No newline at end of file
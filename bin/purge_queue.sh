@@ -1 +1,3 @@
-docker container exec rabbitmq-server rabbitmqctl purge_queue taskiq
\ No newline at end of file
+docker container exec rabbitmq-server rabbitmqctl purge_queue taskiq
+# purged tasks are never picked up, so their lanes' depths must be reset
+poetry run python -c "import asyncio; from src.worker.lanes import reset_lane_depths; asyncio.run(reset_lane_depths())"
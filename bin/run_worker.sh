@@ -1,2 +1,2 @@
 # poetry run taskiq worker -w 1 src.worker.broker:broker src.tasks_example
-poetry run taskiq worker -w 1 --no-configure-logging src.worker.broker:broker src.tasks_example
\ No newline at end of file
+poetry run taskiq worker -w 1 --no-configure-logging src.worker.broker:broker src.tasks_example src.pipeline_example
\ No newline at end of file
@@ -11,6 +11,25 @@ DOMAIN_CONCURRENCY_LIMIT = 5  # number of concurrent requests per domain
 MAX_RETRIES_PER_REQUEST = 1  # number of retries maximum per request
 
 
+# task lanes
+TASK_LANES = {  # lane name -> RabbitMQ message priority (higher runs first)
+    "bulk": 0,
+    "default": 5,
+    "urgent": 9,
+}
+DEFAULT_TASK_LANE = "default"
+PREFETCH_MULTIPLIER = 2  # messages prefetched per concurrent request slot
+
+
+# pipeline stages
+PARSE_PROCESSES = 4  # processes parsing pages per worker
+PARSE_MAX_PENDING = 8  # pages waiting on (or being) parsed per worker
+STORE_BATCH_SIZE = 100  # movies that trigger a database transaction
+STORE_FLUSH_INTERVAL = 0.2  # seconds before a partial batch is written
+STORE_MAX_RETRIES = 3  # retries for a batch that failed to write
+SKIP_NEAR_DUPLICATES = False  # don't parse pages similar to earlier ones
+
+
 # database details
 USING_DATABASE = True
 
@@ -27,4 +46,24 @@ TEST_DATABASE_CONNECT_STRING = f"{DATABASE_DRIVER}://{DATABASE_USER}:{DATABASE_P
 
 # client details
 
-REQUEST_CACHE_LOCATION = ".request_cache"
\ No newline at end of file
+USING_REQUEST_CACHE = False  # cached URLs are never fetched again
+REQUEST_CACHE_LOCATION = ".request_cache"
+REQUEST_CACHE_NEAR_DUPLICATE_DISTANCE = 3  # SimHash bits, None -> disabled
+
+# frontier details
+
+FRONTIER_INITIAL_CAPACITY = 1_000_000  # urls before the bloom filter grows
+FRONTIER_ERROR_RATE = 0.001  # upper bound on the false positive rate
+FRONTIER_BATCH_SIZE = 100  # urls enqueued on the broker at a time
+FRONTIER_CHECKPOINT_LOCATION = ".frontier/checkpoint"
+
+
+# logging details
+
+LOG_LOCATION = "logs/main.log"
+LOG_LEVEL = "INFO"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate the log file after 10MB
+LOG_BACKUP_COUNT = 5  # number of rotated log files kept
+LOG_SAMPLE_RATES = {  # fraction of DEBUG/INFO records kept, per logger
+    "src.web.client.timing": 0.1,  # per-request timings
+}
@@ -1,20 +1,27 @@
 import asyncio
 
 from src.tasks_example import make_request
+from src.web.frontier import create_frontier
 from src.worker.broker import broker
 
 
 async def main():
     await broker.startup()
 
-    task = await make_request.kiq("https://httpbin.org/get")
-    result = await task.wait_result()
-    task = await make_request.kiq("https://httpbin.org/get")
-    result = await task.wait_result()
-    task = await make_request.kiq("https://httpbin.org/get")
-    result = await task.wait_result()
+    frontier = create_frontier(make_request)
+    await frontier.resume()
 
-    print(result.return_value.json())
+    # duplicates are dropped by the frontier, so only one request is made
+    await frontier.extend(["https://httpbin.org/get"] * 3)
+    tasks = await frontier.flush()
+    await frontier.checkpoint()
+
+    for task in tasks:
+        result = await task.wait_result()
+        print(result.return_value.json())
+
+    if not tasks:
+        print("Every URL was already crawled.")
 
     await broker.shutdown()
 
@@ -3,6 +3,7 @@ from typing import List
 
 from sqlalchemy import Column
 from sqlalchemy import Table
+from sqlalchemy import UniqueConstraint
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
@@ -21,6 +22,7 @@ association_table = Table(
 
 class Movie(Base):
     __tablename__ = "movies"
+    __table_args__ = (UniqueConstraint("title", "release_date"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column()
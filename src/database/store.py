@@ -0,0 +1,57 @@
+import datetime
+
+from sqlalchemy.orm import sessionmaker
+
+from .models import Actor, Movie
+
+
+def add_movies(session_factory: sessionmaker, records: list[dict]) -> None:
+    """
+    Store a batch of parsed movies in a single transaction, reusing any
+    actors that are already in the database (or elsewhere in the batch).
+    Movies already stored under the same title and release date are skipped,
+    so that storing a re-fetched page doesn't duplicate its movies.
+    Each batch gets its own session, which is rolled back if the write fails.
+    """
+    with session_factory() as session:
+        try:
+            titles = {record["title"] for record in records}
+            stored = {
+                (movie.title, movie.release_date)
+                for movie in session.query(Movie).filter(Movie.title.in_(titles))
+            }
+
+            names = {
+                actor["name"] for record in records for actor in record["actors"]
+            }
+            actors = {
+                actor.name: actor
+                for actor in session.query(Actor).filter(Actor.name.in_(names))
+            }
+
+            movies = []
+            for record in records:
+                key = (
+                    record["title"],
+                    datetime.datetime.fromisoformat(record["release_date"]),
+                )
+                if key in stored:
+                    continue
+                stored.add(key)
+
+                movie = Movie(*key)
+                for actor_record in record["actors"]:
+                    name = actor_record["name"]
+                    if name not in actors:
+                        actors[name] = Actor(
+                            name,
+                            datetime.datetime.fromisoformat(actor_record["birthday"]),
+                        )
+                    movie.actors.append(actors[name])
+                movies.append(movie)
+
+            session.add_all(movies)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from typing import Optional
+
+from taskiq import Context, TaskiqDepends
+from taskiq_pipelines import Pipeline
+
+import config
+from src.web.parse import parse_movies
+from src.worker.broker import broker
+from src.worker import dependencies
+
+
+logger = logging.getLogger(__name__)
+
+
+@broker.task
+async def fetch_page(url: str, context: Context = TaskiqDepends()) -> Optional[str]:
+    client = dependencies.get_client(context)
+    async with dependencies.get_stage(context, "fetch").slot():
+        response = await client.get(url)
+    # an identical page (found by a CachingClient) has already been parsed
+    if response.extensions.get("duplicate_of"):
+        return None
+    # near-duplicates differ in content, so they are only skipped on request
+    if config.SKIP_NEAR_DUPLICATES and response.extensions.get("near_duplicate_of"):
+        return None
+    return response.text
+
+
+@broker.task
+async def parse_page(
+    html: Optional[str], context: Context = TaskiqDepends()
+) -> list[dict]:
+    if html is None:
+        return []
+    pool = dependencies.get_process_pool(context)
+    loop = asyncio.get_running_loop()
+    async with dependencies.get_stage(context, "parse").slot():
+        return await loop.run_in_executor(pool, parse_movies, html)
+
+
+@broker.task
+async def store_page(records: list[dict], context: Context = TaskiqDepends()) -> int:
+    if not config.USING_DATABASE:
+        logger.debug("Database not in use, %s records not stored.", len(records))
+        return 0
+    await dependencies.get_writer(context).put(records)
+    return len(records)
+
+
+# fetch -> parse -> store, e.g. `await crawl_pipeline.kiq(url)`
+crawl_pipeline = (
+    Pipeline(broker, fetch_page).call_next(parse_page).call_next(store_page)
+)
@@ -2,17 +2,22 @@ import asyncio
 import hashlib
 import logging
 import os
+import threading
+import timeit
 from dataclasses import dataclass
 from functools import wraps
-from json.decoder import JSONDecodeError
 from typing import Optional
 
 import simplejson as json
 import tldextract
 from httpx import AsyncClient, Request, Response
 
+from src.web.fingerprint import SimHashIndex, simhash
+
 
 logger = logging.getLogger(__name__)
+# per-request timings are logged separately, so that they can be sampled
+timing_logger = logging.getLogger(f"{__name__}.timing")
 
 extract = tldextract.TLDExtract()
 
@@ -104,7 +109,7 @@ class RateLimitedClient(AsyncClient):
             already_elapsed (float): the time already elapsed between creating the lock
                 and recieving the complete request
         """
-        logger.debug("Time elapsed during requests: %ss.", already_elapsed)
+        timing_logger.debug("Time elapsed during requests: %ss.", already_elapsed)
 
         # schedule the release of the domain lock for the given domain
         if self._using_domain_interval:
@@ -164,11 +169,9 @@ class RateLimitedClient(AsyncClient):
         while not response.is_success and retries < self.max_retries:
             logger.info(
                 "Request to %s failed with status code %s. Retries left: %s.",
-                (
-                    domain,
-                    response.status_code,
-                    self.max_retries - retries,
-                ),
+                domain,
+                response.status_code,
+                self.max_retries - retries,
             )
             retries += 1
             request = asyncio.create_task(super().send(*args, **kwargs))
@@ -182,10 +185,71 @@ class RateLimitedClient(AsyncClient):
         return response
 
 
+@dataclass
+class DedupStats:
+    responses: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    bytes_received: int = 0  # response bodies stored, before deduplication
+    bytes_stored: int = 0  # response bodies written to new blobs
+    lookup_time: float = 0  # seconds spent looking up duplicates
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_received - self.bytes_stored
+
+    @property
+    def average_lookup_time(self) -> float:
+        return self.lookup_time / self.responses if self.responses else 0.0
+
+
+# these describe the body as received, not the decoded body that is cached
+UNCACHED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    Write to a temporary file, then rename it into place, so that readers
+    (and other workers) never see a partially written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
 class CachingClient(RateLimitedClient):
-    def __init__(self, cache_location, *args, **kwargs):
+    def __init__(
+        self,
+        cache_location,
+        *args,
+        near_duplicate_distance: Optional[int] = None,
+        **kwargs,
+    ):
+        """
+        Caches responses on disk. Bodies are stored once per content hash
+        (in `blobs/`), and each URL entry points at its blob, so identical
+        bodies served under different URLs share storage.
+
+        Responses whose body was already stored under another URL carry that
+        URL in `response.extensions["duplicate_of"]`. If
+        `near_duplicate_distance` is given, bodies whose SimHash is within that
+        many bits of an earlier body carry its URL in
+        `response.extensions["near_duplicate_of"]`.
+        """
         self.cache_location = os.path.join(os.getcwd(), cache_location)
         self.caching = self.cache_location is not None
+        self.blob_location = os.path.join(self.cache_location, "blobs")
+        self.dedup_stats = DedupStats()
+
+        self.near_duplicates = None
+        if near_duplicate_distance is not None:
+            self.near_duplicates = SimHashIndex(near_duplicate_distance)
+
+        if self.caching:
+            os.makedirs(self.blob_location, exist_ok=True)
+            self.load_fingerprints()
+
         super().__init__(*args, **kwargs)
 
     def get_filepath(self, request: Request) -> str:
@@ -193,31 +257,134 @@ class CachingClient(RateLimitedClient):
         filepath = os.path.join(self.cache_location, f"{filename}.json")
         return filepath
 
+    def get_blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_location, content_hash)
+
+    def load_fingerprints(self):
+        """Rebuild the near-duplicate index from the blobs already stored."""
+        if self.near_duplicates is None:
+            return
+
+        for filename in os.listdir(self.blob_location):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(self.blob_location, filename), "r") as j:
+                blob = json.load(j)
+            if blob.get("simhash") is not None:
+                self.near_duplicates.add(blob["simhash"], blob["url"])
+
     def retrieve_cached_response(self, filepath):
         with open(filepath, "r") as j:
             data = json.load(j)
 
-            response = Response(
+        # a cache hit is a duplicate of itself, it was handled when first seen
+        if "body" not in data["response"]:  # cached before blob storage
+            return Response(
                 data["response"]["status_code"],
-                json=data["response"]["json"],
+                json=data["response"].get("json"),
+                extensions={"duplicate_of": data["url"], "near_duplicate_of": None},
             )
 
-            return response
+        with open(self.get_blob_path(data["response"]["body"]), "rb") as b:
+            content = b.read()
+
+        return Response(
+            data["response"]["status_code"],
+            headers=data["response"]["headers"],
+            content=content,
+            extensions={
+                "duplicate_of": data["response"].get("duplicate_of") or data["url"],
+                "near_duplicate_of": data["response"].get("near_duplicate_of"),
+            },
+        )
+
+    def read_blob_url(self, content_hash: str) -> Optional[str]:
+        """
+        Get the URL a body was first stored under, or None if it isn't stored.
+        The blob's sidecar is written last, so it marks a complete blob.
+        """
+        try:
+            with open(f"{self.get_blob_path(content_hash)}.json", "r") as j:
+                return json.load(j)["url"]
+        except FileNotFoundError:
+            return None
+
+    def write_blob(
+        self, content_hash: str, content: bytes, url: str, fingerprint: Optional[int]
+    ):
+        blob_path = self.get_blob_path(content_hash)
+        write_atomic(blob_path, content)
+        sidecar = {"url": url, "simhash": fingerprint}
+        write_atomic(f"{blob_path}.json", json.dumps(sidecar).encode("utf-8"))
+
+    async def store_body(
+        self, url: str, response: Response, fingerprint: Optional[int] = None
+    ) -> dict:
+        """
+        Store the response body under its content hash, unless an identical
+        body is already stored, and look its SimHash `fingerprint` up in the
+        near-duplicate index. File access runs in a thread, off the event loop.
+        """
+        content = response.content
+        content_hash = hashlib.sha256(content).hexdigest()
+        duplicate_of = None
+        near_duplicate_of = None
+
+        start = timeit.default_timer()
+
+        first_url = await asyncio.to_thread(self.read_blob_url, content_hash)
+        if first_url is not None:
+            if first_url != url:
+                duplicate_of = first_url
+            fingerprint = None
+        elif fingerprint is not None:
+            near_duplicate_of = self.near_duplicates.query(fingerprint)
+
+        self.dedup_stats.lookup_time += timeit.default_timer() - start
+        self.dedup_stats.responses += 1
+        self.dedup_stats.bytes_received += len(content)
+
+        if duplicate_of is not None:
+            self.dedup_stats.exact_duplicates += 1
+        if near_duplicate_of is not None:
+            self.dedup_stats.near_duplicates += 1
+
+        if first_url is None:
+            await asyncio.to_thread(
+                self.write_blob, content_hash, content, url, fingerprint
+            )
+            self.dedup_stats.bytes_stored += len(content)
+            if fingerprint is not None:
+                self.near_duplicates.add(fingerprint, url)
+
+        return {
+            "body": content_hash,
+            "duplicate_of": duplicate_of,
+            "near_duplicate_of": near_duplicate_of,
+        }
+
+    async def construct_cached_response(
+        self, request: Request, response: Response, fingerprint: Optional[int] = None
+    ):
+        url = str(request.url)
+        body = await self.store_body(url, response, fingerprint)
+
+        response.extensions["duplicate_of"] = body["duplicate_of"]
+        response.extensions["near_duplicate_of"] = body["near_duplicate_of"]
 
-    def construct_cached_response(self, request: Request, response: Response):
-        request = request.__dict__
         data = {
-            "url": str(request["url"]),
-            "headers": request.get("headers", {}).__dict__,
+            "url": url,
+            "headers": request.headers.multi_items(),
             "response": {
                 "status_code": response.status_code,
-                "headers": response.headers.__dict__,
+                "headers": [
+                    (key, value)
+                    for key, value in response.headers.multi_items()
+                    if key.lower() not in UNCACHED_HEADERS
+                ],
+                **body,
             },
         }
-        try:  # if json attached
-            data["response"]["json"] = response.json()
-        except JSONDecodeError:  # no json attached
-            pass
 
         return data
 
@@ -228,15 +395,23 @@ class CachingClient(RateLimitedClient):
         if self.caching:
             filepath = self.get_filepath(request)
 
-            if os.path.exists(filepath):
-                return self.retrieve_cached_response(filepath)
+            if await asyncio.to_thread(os.path.exists, filepath):
+                return await asyncio.to_thread(self.retrieve_cached_response, filepath)
 
         response = await super().send(*args, **kwargs)
 
         if self.caching:
-            cached_data = self.construct_cached_response(request, response)
+            fingerprint = None
+            if self.near_duplicates is not None:
+                # SimHash is CPU-bound, so keep it off the event loop
+                fingerprint = await asyncio.to_thread(simhash, response.text)
+
+            cached_data = await self.construct_cached_response(
+                request, response, fingerprint
+            )
 
-            with open(filepath, "w") as j:
-                json.dump(cached_data, j)
+            await asyncio.to_thread(
+                write_atomic, filepath, json.dumps(cached_data).encode("utf-8")
+            )
 
         return response
@@ -0,0 +1,78 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Optional
+
+
+WORD = re.compile(r"\w+")
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    A 64-bit SimHash of the text's word shingles. Texts that share most of
+    their shingles get fingerprints a small Hamming distance apart.
+    """
+    words = WORD.findall(text.lower())
+    shingles = {
+        " ".join(words[i : i + shingle_size])
+        for i in range(max(len(words) - shingle_size + 1, 1))
+    }
+
+    # count each (byte position, byte value) pair rather than each bit, which
+    # is 8 updates per shingle instead of 64
+    byte_counts = Counter()
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        byte_counts.update(enumerate(digest))
+
+    ones = [0] * 64
+    for (position, value), count in byte_counts.items():
+        offset = (7 - position) * 8  # big-endian, as in int.from_bytes
+        for bit in range(8):
+            if value >> bit & 1:
+                ones[offset + bit] += count
+
+    return sum(1 << bit for bit in range(64) if 2 * ones[bit] > len(shingles))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class SimHashIndex:
+    def __init__(self, max_distance: int = 3):
+        """
+        Finds fingerprints within `max_distance` bits of each other without
+        comparing against every stored fingerprint. The 64 bits are split into
+        `max_distance + 1` bands; any two fingerprints that close must match
+        exactly on at least one band, so only those candidates are compared.
+
+        Args:
+            max_distance (int): the largest Hamming distance counted as a match
+        """
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        self.band_bits = -(-64 // self.num_bands)
+        self.band_mask = (1 << self.band_bits) - 1
+        self.bands: list[dict[int, list[tuple[int, str]]]] = [
+            {} for _ in range(self.num_bands)
+        ]
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.bands[0].values())
+
+    def _band_values(self, fingerprint: int):
+        for band in range(self.num_bands):
+            yield band, fingerprint >> (band * self.band_bits) & self.band_mask
+
+    def add(self, fingerprint: int, key: str):
+        for band, value in self._band_values(fingerprint):
+            self.bands[band].setdefault(value, []).append((fingerprint, key))
+
+    def query(self, fingerprint: int) -> Optional[str]:
+        """Get the key of a stored near-duplicate of the fingerprint, if any."""
+        for band, value in self._band_values(fingerprint):
+            for candidate, key in self.bands[band].get(value, ()):
+                if hamming_distance(fingerprint, candidate) <= self.max_distance:
+                    return key
+        return None
@@ -0,0 +1,408 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import struct
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from redis.asyncio import Redis
+from taskiq import AsyncTaskiqDecoratedTask, AsyncTaskiqTask
+
+import config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Reduce a URL to a canonical form so that trivially different spellings
+    of the same resource are only crawled once: the scheme and host are
+    lowercased, default ports and fragments are dropped, an empty path
+    becomes "/" and query parameters are ordered by key. Query parameters
+    are otherwise kept as written, and repeated keys keep their order.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:  # IPv6 literals lose their brackets in hostname
+        host = f"[{host}]"
+
+    netloc = host
+    if parts.port is not None and DEFAULT_PORTS.get(scheme) != parts.port:
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo = f"{userinfo}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or "/"
+    params = [param for param in parts.query.split("&") if param]
+    # sorted() is stable, so repeated keys keep their relative order
+    query = "&".join(sorted(params, key=lambda param: param.partition("=")[0]))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class BloomFilter:
+    _header = struct.Struct(">QQdQI")
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        A fixed-size Bloom filter sized for `capacity` items at `error_rate`.
+
+        Args:
+            capacity (int): the number of items the filter is sized for
+            error_rate (float): the false-positive rate once `capacity` is reached
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+
+        num_bits = -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.num_bits = max(int(math.ceil(num_bits)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _indexes(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[index >> 3] & (1 << (index & 7)) for index in self._indexes(item)
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, item: str) -> bool:
+        """
+        Add an item to the filter, returning False if it was (probably)
+        already present and True if it is definitely new.
+        """
+        added = False
+        for index in self._indexes(item):
+            mask = 1 << (index & 7)
+            if not self.bits[index >> 3] & mask:
+                self.bits[index >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def memory(self) -> int:
+        return len(self.bits)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Estimated false-positive rate at the current fill level."""
+        fill = 1 - math.exp(-self.num_hashes * self.count / self.num_bits)
+        return fill**self.num_hashes
+
+    def to_bytes(self) -> bytes:
+        header = self._header.pack(
+            self.capacity, self.count, self.error_rate, self.num_bits, self.num_hashes
+        )
+        return header + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        capacity, count, error_rate, num_bits, num_hashes = cls._header.unpack_from(
+            data
+        )
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = error_rate
+        bloom.count = count
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits = bytearray(data[cls._header.size :])
+        return bloom
+
+
+class ScalableBloomFilter:
+    _header = struct.Struct(">QdddI")
+
+    def __init__(
+        self,
+        initial_capacity: int = 100_000,
+        error_rate: float = 0.001,
+        growth: float = 2,
+        tightening: float = 0.9,
+    ):
+        """
+        A Bloom filter that grows by chaining progressively larger (and
+        stricter) filters, keeping the compound false-positive rate below
+        `error_rate` no matter how many items are added.
+
+        Args:
+            initial_capacity (int): the capacity of the first filter in the chain
+            error_rate (float): the upper bound on the false-positive rate
+            growth (float): the capacity multiplier for each new filter
+            tightening (float): the error rate multiplier for each new filter
+        """
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters: list[BloomFilter] = []
+
+    def _add_filter(self):
+        n = len(self.filters)
+        capacity = int(self.initial_capacity * self.growth**n)
+        error_rate = self.error_rate * (1 - self.tightening) * self.tightening**n
+        self.filters.append(BloomFilter(capacity, error_rate))
+        logger.debug("Bloom filter grown to %s stages (capacity %s).", n + 1, capacity)
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in bloom for bloom in self.filters)
+
+    def __len__(self) -> int:
+        return sum(len(bloom) for bloom in self.filters)
+
+    def add(self, item: str) -> bool:
+        if item in self:
+            return False
+        if not self.filters or self.filters[-1].is_full:
+            self._add_filter()
+        return self.filters[-1].add(item)
+
+    @property
+    def memory(self) -> int:
+        return sum(bloom.memory for bloom in self.filters)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Estimated compound false-positive rate at the current fill level."""
+        miss = 1.0
+        for bloom in self.filters:
+            miss *= 1 - bloom.false_positive_rate
+        return 1 - miss
+
+    @property
+    def bytes_per_million(self) -> float:
+        """Filter memory (in bytes) per million items added so far."""
+        if not len(self):
+            return 0.0
+        return self.memory / len(self) * 1_000_000
+
+    def to_bytes(self) -> bytes:
+        chunks = [
+            self._header.pack(
+                self.initial_capacity,
+                self.error_rate,
+                self.growth,
+                self.tightening,
+                len(self.filters),
+            )
+        ]
+        for bloom in self.filters:
+            data = bloom.to_bytes()
+            chunks.append(struct.pack(">Q", len(data)))
+            chunks.append(data)
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ScalableBloomFilter":
+        initial_capacity, error_rate, growth, tightening, n = cls._header.unpack_from(
+            data
+        )
+        scalable = cls(initial_capacity, error_rate, growth, tightening)
+        offset = cls._header.size
+        for _ in range(n):
+            (size,) = struct.unpack_from(">Q", data, offset)
+            offset += 8
+            scalable.filters.append(
+                BloomFilter.from_bytes(data[offset : offset + size])
+            )
+            offset += size
+        return scalable
+
+
+class FileCheckpointStore:
+    def __init__(self, location: str):
+        self.location = os.path.join(os.getcwd(), location)
+
+    def _write(self, data: bytes):
+        os.makedirs(os.path.dirname(self.location), exist_ok=True)
+        # write then rename, so a crash mid-write never corrupts the checkpoint
+        tmp_location = f"{self.location}.tmp"
+        with open(tmp_location, "wb") as f:
+            f.write(data)
+        os.replace(tmp_location, self.location)
+
+    def _read(self) -> Optional[bytes]:
+        if not os.path.exists(self.location):
+            return None
+        with open(self.location, "rb") as f:
+            return f.read()
+
+    async def save(self, data: bytes):
+        await asyncio.to_thread(self._write, data)
+
+    async def load(self) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read)
+
+
+class RedisCheckpointStore:
+    def __init__(self, redis_url: str, key: str = "frontier:checkpoint"):
+        self.redis_url = redis_url
+        self.key = key
+
+    async def save(self, data: bytes):
+        async with Redis.from_url(self.redis_url) as redis:
+            await redis.set(self.key, data)
+
+    async def load(self) -> Optional[bytes]:
+        async with Redis.from_url(self.redis_url) as redis:
+            return await redis.get(self.key)
+
+
+class Frontier:
+    def __init__(
+        self,
+        task: AsyncTaskiqDecoratedTask,
+        store=None,
+        batch_size: int = 100,
+        seen: Optional[ScalableBloomFilter] = None,
+    ):
+        """
+        Deduplicates URLs before they are sent to the broker. URLs are
+        normalized and checked against a scalable Bloom filter; unseen URLs
+        are buffered and enqueued on `task` in batches.
+
+        Args:
+            task (AsyncTaskiqDecoratedTask): the task each unseen URL is sent to
+            store (FileCheckpointStore | RedisCheckpointStore): where checkpoints
+                are saved to and resumed from. None disables checkpointing.
+            batch_size (int): the number of buffered URLs that triggers a flush
+            seen (ScalableBloomFilter): the filter of already seen URLs
+        """
+        self.task = task
+        self.store = store
+        self.batch_size = batch_size
+        self.seen = seen if seen is not None else ScalableBloomFilter()
+        self.pending: list[str] = []
+        self.duplicates = 0
+        self.rejected = 0
+        self.enqueued = 0
+        # only one flush may take batches off the head of pending at a time
+        self._flush_lock = asyncio.Lock()
+
+    async def add(self, url: str) -> bool:
+        """
+        Add a URL to the frontier. Returns True if the URL was unseen and will
+        be enqueued, and False if it was dropped as a duplicate or malformed.
+        """
+        try:
+            url = normalize_url(url)
+        except ValueError:
+            logger.warning("Frontier rejected malformed URL %r.", url)
+            self.rejected += 1
+            return False
+        if not self.seen.add(url):
+            self.duplicates += 1
+            return False
+
+        self.pending.append(url)
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        return True
+
+    async def extend(self, urls) -> int:
+        added = 0
+        for url in urls:
+            added += await self.add(url)
+        return added
+
+    async def flush(self) -> list[AsyncTaskiqTask]:
+        """
+        Enqueue every buffered URL on the broker, returning the sent tasks.
+        """
+        sent = []
+        async with self._flush_lock:
+            while self.pending:
+                batch = self.pending[: self.batch_size]
+                tasks = await asyncio.gather(*(self.task.kiq(url) for url in batch))
+                sent.extend(tasks)
+                # only drop the batch once it is safely on the broker; add()
+                # only appends, so the head of pending is still this batch
+                del self.pending[: len(batch)]
+                self.enqueued += len(batch)
+                logger.debug("Frontier enqueued a batch of %s URLs.", len(batch))
+        return sent
+
+    async def checkpoint(self):
+        """
+        Persist the filter and any URLs not yet enqueued. Pending URLs are
+        already marked as seen, so they must be saved alongside the filter
+        or they would be lost on restart.
+        """
+        if self.store is None:
+            return
+        data = {
+            "seen": base64.b64encode(self.seen.to_bytes()).decode("ascii"),
+            "pending": self.pending,
+        }
+        await self.store.save(json.dumps(data).encode("utf-8"))
+        logger.info(
+            "Frontier checkpoint saved (%s seen, %s pending).",
+            len(self.seen),
+            len(self.pending),
+        )
+
+    async def resume(self) -> bool:
+        """
+        Restore the state saved by the last checkpoint, if there is one.
+        Returns True if a checkpoint was found.
+        """
+        if self.store is None:
+            return False
+        raw = await self.store.load()
+        if raw is None:
+            return False
+        data = json.loads(raw)
+        self.seen = ScalableBloomFilter.from_bytes(base64.b64decode(data["seen"]))
+        self.pending = data["pending"]
+        logger.info(
+            "Frontier resumed from checkpoint (%s seen, %s pending).",
+            len(self.seen),
+            len(self.pending),
+        )
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "seen": len(self.seen),
+            "pending": len(self.pending),
+            "enqueued": self.enqueued,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "filter_bytes": self.seen.memory,
+            "filter_bytes_per_million": self.seen.bytes_per_million,
+            "false_positive_rate": self.seen.false_positive_rate,
+        }
+
+
+def create_frontier(task: AsyncTaskiqDecoratedTask) -> Frontier:
+    """Build a frontier for `task` from the settings in config.py."""
+    seen = ScalableBloomFilter(
+        config.FRONTIER_INITIAL_CAPACITY, config.FRONTIER_ERROR_RATE
+    )
+    store = FileCheckpointStore(config.FRONTIER_CHECKPOINT_LOCATION)
+    return Frontier(task, store, config.FRONTIER_BATCH_SIZE, seen)
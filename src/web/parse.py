@@ -0,0 +1,62 @@
+import datetime
+from html.parser import HTMLParser
+from typing import Optional
+
+
+def is_date(value: Optional[str]) -> bool:
+    try:
+        datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+class MovieParser(HTMLParser):
+    """
+    An example parser for pages that list movies as
+
+        <div class="movie" data-title="..." data-release-date="YYYY-MM-DD">
+            <span class="actor" data-name="..." data-birthday="YYYY-MM-DD"></span>
+        </div>
+
+    Movies and actors without a name or a valid date are skipped, so that
+    one incomplete listing can't fail the batch it is stored in.
+
+    Replace this (per project) with a parser for the site being scraped.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.movies = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+
+        if "movie" in classes:
+            movie = {
+                "title": attrs.get("data-title"),
+                "release_date": attrs.get("data-release-date"),
+                "actors": [],
+            }
+            valid = movie["title"] and is_date(movie["release_date"])
+            # actors of a skipped movie must not be added to the previous one
+            self.movies.append(movie if valid else None)
+        elif "actor" in classes and self.movies and self.movies[-1] is not None:
+            actor = {
+                "name": attrs.get("data-name"),
+                "birthday": attrs.get("data-birthday"),
+            }
+            if actor["name"] and is_date(actor["birthday"]):
+                self.movies[-1]["actors"].append(actor)
+
+
+def parse_movies(html: str) -> list[dict]:
+    """
+    Parse the movies (and their actors) out of a page. This is CPU-bound,
+    so it is run in a process pool rather than on the event loop.
+    """
+    parser = MovieParser()
+    parser.feed(html)
+    parser.close()
+    return [movie for movie in parser.movies if movie is not None]
@@ -1,5 +1,7 @@
 import logging
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 import sqlalchemy
 from sqlalchemy.orm import scoped_session, sessionmaker
@@ -9,25 +11,46 @@ from taskiq_pipelines import PipelineMiddleware
 from taskiq_redis import RedisAsyncResultBackend
 
 import config
-from src.web.client import ClientSettings, RateLimitedClient
+from src.web.client import CachingClient, ClientSettings, RateLimitedClient
 from src.database.models import Base
+from src.database.store import add_movies
+from src.worker.lanes import LaneMetricsMiddleware
+from src.worker.log import configure_logging
+from src.worker.stages import BatchWriter, Stage
 
-
-logging.basicConfig(
-    filename="logs/main.log",
-    level=logging.getLevelName("INFO"),
-    format=(
-        "[%(asctime)s][%(name)s]" "[%(levelname)-7s][%(processName)s]" " %(message)s"
-    ),
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 env = os.environ.get("ENVIRONMENT")
 
 
+def get_client_settings() -> ClientSettings:
+    clientSettings = ClientSettings(config.GLOBAL_RATE_LIMIT, config.DOMAIN_RATE_LIMIT)
+    # maximum concurrent requests per worker
+    clientSettings.set_global_concurrency(config.GLOBAL_CONCURRENCY_LIMIT)
+    # maximum concurrent requests per TLD
+    clientSettings.set_domain_concurrency(config.DOMAIN_CONCURRENCY_LIMIT)
+    # maximum retry per request
+    clientSettings.max_retries = config.MAX_RETRIES_PER_REQUEST
+    return clientSettings
+
+
+def get_prefetch_count(clientSettings: ClientSettings) -> int:
+    """
+    Each worker can only have `global_concurrency` requests in flight, so
+    prefetching far beyond that just hoards messages other workers could take
+    (and keeps urgent tasks stuck behind them), while prefetching less starves
+    the client.
+    """
+    return clientSettings._global_concurrency * config.PREFETCH_MULTIPLIER
+
+
 broker: AsyncBroker = AioPikaBroker(
     config.RABBITMQ_URL,
+    qos=get_prefetch_count(get_client_settings()),
+    max_priority=max(config.TASK_LANES.values()),
 ).with_result_backend(RedisAsyncResultBackend(config.REDIS_URL))
+broker.add_middlewares(LaneMetricsMiddleware(config.REDIS_URL))  # for lanes
 
 if env and env == "pytest":  # use memory broker for testing
     broker = InMemoryBroker()
@@ -37,18 +60,27 @@ broker.add_middlewares(PipelineMiddleware())  # for pipelines
 
 @broker.on_event(TaskiqEvents.WORKER_STARTUP)
 async def startup(state: TaskiqState) -> None:
-    clientSettings = ClientSettings(config.GLOBAL_RATE_LIMIT, config.DOMAIN_RATE_LIMIT)
-    # maximum concurrent requests per worker
-    clientSettings.set_global_concurrency(config.GLOBAL_CONCURRENCY_LIMIT)
-    # maximum concurrent requests per TLD
-    clientSettings.set_domain_concurrency(config.DOMAIN_CONCURRENCY_LIMIT)
-    # maximum retry per request
-    clientSettings.max_retries = config.MAX_RETRIES_PER_REQUEST
+    clientSettings = get_client_settings()
     # create httpx.AsyncClient with rate limits
-    state.client = RateLimitedClient(clientSettings)
+    if config.USING_REQUEST_CACHE:
+        state.client = CachingClient(
+            config.REQUEST_CACHE_LOCATION,
+            clientSettings,
+            near_duplicate_distance=config.REQUEST_CACHE_NEAR_DUPLICATE_DISTANCE,
+        )
+    else:
+        state.client = RateLimitedClient(clientSettings)
     logger.info("HTTP client opened (%s).", type(state.client))
     logger.info("Rate limits: %s", clientSettings)
 
+    # the client already limits fetches, the stage only measures them
+    state.stages = {
+        "fetch": Stage("fetch", config.GLOBAL_CONCURRENCY_LIMIT),
+        "parse": Stage("parse", config.PARSE_MAX_PENDING),
+    }
+    state.process_pool = ProcessPoolExecutor(config.PARSE_PROCESSES)
+    logger.info("Parse process pool opened (%s processes).", config.PARSE_PROCESSES)
+
     if not config.USING_DATABASE:
         return
 
@@ -61,18 +93,55 @@ async def startup(state: TaskiqState) -> None:
         config.DATABASE_CONNECT_STRING,
     )
 
-    state.session = scoped_session(sessionmaker(bind=engine))
+    session_factory = sessionmaker(bind=engine)
+    state.session = scoped_session(session_factory)
     logger.info("Database session opened.")
 
+    # the writer runs in its own thread, so it opens a session per batch
+    prefetch_count = get_prefetch_count(clientSettings)
+    state.writer = BatchWriter(
+        "store",
+        partial(add_movies, session_factory),
+        batch_size=config.STORE_BATCH_SIZE,
+        # each waiting store holds a prefetched message, so write once half of
+        # them are waiting, leaving the rest for the fetch and parse stages
+        max_pending=prefetch_count,
+        max_puts=max(prefetch_count // 2, 1),
+        flush_interval=config.STORE_FLUSH_INTERVAL,
+        max_retries=config.STORE_MAX_RETRIES,
+    )
+    state.writer.start()
+    state.stages["store"] = state.writer
+    logger.info("Database writer started.")
+
 
 @broker.on_event(TaskiqEvents.WORKER_SHUTDOWN)
 async def shutdown(state: TaskiqState) -> None:
     if hasattr(state, "client"):
         await state.client.aclose()
         logger.info("HTTP client closed (%s).", type(state.client))
+        if hasattr(state.client, "dedup_stats"):
+            stats = state.client.dedup_stats
+            logger.info(
+                "Response deduplication: %s, %s bytes saved, %ss average lookup.",
+                stats,
+                stats.bytes_saved,
+                stats.average_lookup_time,
+            )
     else:
         logger.info("No HTTP client found. Continuing...")
 
+    if hasattr(state, "writer"):
+        await state.writer.close()
+        logger.info("Database writer closed.")
+
+    if hasattr(state, "process_pool"):
+        state.process_pool.shutdown()
+        logger.info("Parse process pool closed.")
+
+    for name, stage in getattr(state, "stages", {}).items():
+        logger.info("Stage %s metrics: %s", name, stage.metrics.as_dict())
+
     if hasattr(state, "session"):
         state.session.close()
         logger.info("Database session closed.")
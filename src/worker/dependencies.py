@@ -1,7 +1,11 @@
+from concurrent.futures import ProcessPoolExecutor
+
 from taskiq import Context
 from httpx import AsyncClient
 from sqlalchemy.orm import scoped_session
 
+from src.worker.stages import BatchWriter, Stage
+
 
 def get_client(context: Context) -> AsyncClient:
     return context.state.client
@@ -9,3 +13,15 @@ def get_client(context: Context) -> AsyncClient:
 
 def get_session(context: Context) -> scoped_session:
     return context.state.session
+
+
+def get_process_pool(context: Context) -> ProcessPoolExecutor:
+    return context.state.process_pool
+
+
+def get_stage(context: Context, name: str) -> Stage:
+    return context.state.stages[name]
+
+
+def get_writer(context: Context) -> BatchWriter:
+    return context.state.writer
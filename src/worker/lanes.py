@@ -0,0 +1,121 @@
+import logging
+import time
+from typing import Any
+
+from redis.asyncio import Redis
+from taskiq import AsyncTaskiqDecoratedTask, TaskiqMessage, TaskiqMiddleware
+from taskiq.kicker import AsyncKicker
+
+import config
+
+logger = logging.getLogger(__name__)
+
+DEPTH_KEY = "lanes:depth"
+LAG_KEY = "lanes:lag"
+PICKED_UP_KEY = "lanes:picked_up"  # + task id, marks tasks already counted out
+PICKED_UP_TTL = 24 * 60 * 60  # seconds a redelivery is recognised for
+
+
+def in_lane(task: AsyncTaskiqDecoratedTask, lane: str) -> AsyncKicker:
+    """
+    Get a kicker that sends the task in the given lane, e.g.
+    `await in_lane(make_request, "urgent").kiq(url)`.
+    """
+    if lane not in config.TASK_LANES:
+        raise ValueError(f"Unknown task lane: {lane}")
+    return task.kicker().with_labels(lane=lane)
+
+
+class LaneMetricsMiddleware(TaskiqMiddleware):
+    def __init__(self, redis_url: str):
+        """
+        Maps each message's lane onto a RabbitMQ message priority, and keeps
+        per-lane queue depth and lag in Redis, so that they are shared by
+        every producer and worker.
+
+        Args:
+            redis_url (str): the Redis instance the metrics are kept in
+        """
+        super().__init__()
+        self.redis_url = redis_url
+        self.redis = None
+
+    async def startup(self):
+        self.redis = Redis.from_url(self.redis_url)
+
+    async def shutdown(self):
+        if self.redis is not None:
+            await self.redis.close()
+
+    def pre_send(self, message: TaskiqMessage) -> TaskiqMessage:
+        lane = message.labels.get("lane", config.DEFAULT_TASK_LANE)
+        if lane not in config.TASK_LANES:
+            logger.warning(
+                "Task %s sent in unknown lane %s, using lane %s instead.",
+                message.task_name,
+                lane,
+                config.DEFAULT_TASK_LANE,
+            )
+            lane = config.DEFAULT_TASK_LANE
+        message.labels["lane"] = lane
+        # an explicit priority label takes precedence over the lane's
+        message.labels.setdefault("priority", str(config.TASK_LANES[lane]))
+        message.labels["enqueued_at"] = str(time.time())
+        return message
+
+    async def post_send(self, message: TaskiqMessage):
+        await self.redis.hincrby(DEPTH_KEY, message.labels["lane"], 1)
+
+    async def pre_execute(self, message: TaskiqMessage) -> TaskiqMessage:
+        lane = message.labels.get("lane")
+        enqueued_at = message.labels.get("enqueued_at")
+
+        # only count messages that were counted in by post_send
+        if lane not in config.TASK_LANES or enqueued_at is None:
+            return message
+
+        lag = time.time() - float(enqueued_at)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(f"{PICKED_UP_KEY}:{message.task_id}", 1, nx=True, ex=PICKED_UP_TTL)
+            pipe.hincrby(DEPTH_KEY, lane, -1)
+            pipe.hset(LAG_KEY, lane, lag)
+            first_pickup, *_ = await pipe.execute()
+
+        if not first_pickup:
+            # redelivered (e.g. after a worker crash), so already counted out
+            await self.redis.hincrby(DEPTH_KEY, lane, 1)
+            return message
+
+        logger.debug(
+            "Task %s picked up from lane %s after %ss.", message.task_id, lane, lag
+        )
+
+        return message
+
+
+async def get_lane_metrics(redis_url: str = config.REDIS_URL) -> dict[str, Any]:
+    """
+    Get the queue depth and the most recently observed lag (the time between
+    a task being sent and being picked up by a worker) for each lane.
+    """
+    async with Redis.from_url(redis_url) as redis:
+        depths = await redis.hgetall(DEPTH_KEY)
+        lags = await redis.hgetall(LAG_KEY)
+
+    metrics = {}
+    for lane in config.TASK_LANES:
+        key = lane.encode("utf-8")
+        metrics[lane] = {
+            "depth": int(depths.get(key, 0)),
+            "lag": float(lags[key]) if key in lags else None,
+        }
+    return metrics
+
+
+async def reset_lane_depths(redis_url: str = config.REDIS_URL):
+    """
+    Reset every lane's depth to zero, e.g. after the queue has been purged,
+    since purged messages are never counted out.
+    """
+    async with Redis.from_url(redis_url) as redis:
+        await redis.delete(DEPTH_KEY)
@@ -0,0 +1,133 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+import config
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "process": record.processName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:  # already formatted by StructuredQueueHandler
+            data["exception"] = record.exc_text
+        return json.dumps(data)
+
+
+class StructuredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Unlike QueueHandler.prepare, keep the traceback out of the message, so
+        that the listener can write it as its own field. The traceback is
+        formatted here because exc_info can't safely cross to another thread.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rates: dict[str, float], max_level: int = logging.INFO):
+        """
+        Randomly drops a fraction of the records from chatty loggers, so that
+        hot-path messages don't flood the log queue under load.
+
+        Args:
+            sample_rates (dict[str, float]): the fraction of records to keep,
+                keyed by logger name. Child loggers inherit their parent's rate.
+            max_level (int): records above this level are never dropped
+        """
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.max_level = max_level
+
+    def _get_sample_rate(self, name: str) -> Optional[float]:
+        while name:
+            if name in self.sample_rates:
+                return self.sample_rates[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        rate = self._get_sample_rate(record.name)
+        return rate is None or random.random() < rate
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+def configure_logging(
+    filename: str = config.LOG_LOCATION,
+    level: str = config.LOG_LEVEL,
+    sample_rates: dict[str, float] = config.LOG_SAMPLE_RATES,
+) -> QueueListener:
+    """
+    Route all logging through a queue, so that the event loop only ever
+    enqueues records and a listener thread does the (blocking) file writes.
+    Records are written as JSON lines to a size-rotated file. Calling this
+    again while logging is configured returns the running listener.
+    """
+    global _listener, _queue_handler
+
+    if _listener is not None:
+        return _listener
+
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+
+    file_handler = RotatingFileHandler(
+        filename,
+        maxBytes=config.LOG_MAX_BYTES,
+        backupCount=config.LOG_BACKUP_COUNT,
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = StructuredQueueHandler(log_queue)
+    _queue_handler.setFormatter(logging.Formatter())
+    _queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    root.setLevel(logging.getLevelName(level))
+    root.addHandler(_queue_handler)
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    return _listener
+
+
+@atexit.register
+def stop_logging():
+    """Write any queued records, then stop the listener thread."""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+
+    _listener = None
+    _queue_handler = None
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    processed: int = 0
+    busy_time: float = 0  # seconds spent doing work
+    blocked_time: float = 0  # seconds spent waiting on backpressure
+    started: float = field(default_factory=timeit.default_timer)
+
+    @property
+    def throughput(self) -> float:
+        """Items processed per second since the stage was created."""
+        elapsed = timeit.default_timer() - self.started
+        return self.processed / elapsed if elapsed else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "busy_time": self.busy_time,
+            "blocked_time": self.blocked_time,
+            "throughput": self.throughput,
+        }
+
+
+class Stage:
+    def __init__(self, name: str, max_pending: int):
+        """
+        A pipeline stage that admits at most `max_pending` items at a time.
+        Once it is full, tasks entering the stage wait for a slot. This only
+        bounds the work in progress within a worker: messages between stages
+        still queue up in the broker.
+
+        Args:
+            name (str): the name the stage's metrics are reported under
+            max_pending (int): the maximum number of items in the stage
+        """
+        self.name = name
+        self._slots = asyncio.Semaphore(max_pending)
+        self.metrics = StageMetrics(name)
+
+    @asynccontextmanager
+    async def slot(self, items: int = 1):
+        start = timeit.default_timer()
+        async with self._slots:
+            acquired = timeit.default_timer()
+            self.metrics.blocked_time += acquired - start
+            try:
+                yield
+            finally:
+                self.metrics.busy_time += timeit.default_timer() - acquired
+        self.metrics.processed += items
+
+
+class BatchWriter:
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[list], Any],
+        batch_size: int = 100,
+        max_pending: int = 20,
+        max_puts: int = 10,
+        flush_interval: float = 0.2,
+        max_retries: int = 0,
+        retry_delay: float = 1.0,
+    ):
+        """
+        Collects the items of several `put` calls into batches and passes each
+        batch to `write`, which is run in a dedicated thread so that blocking
+        database calls stay off the event loop. `put` only returns once its
+        items are written, raising if the write failed. All items of a `put`
+        go into the same batch, so they are written (or fail) together.
+
+        Since every waiting `put` holds a task (and so a prefetched message),
+        `max_pending` and `max_puts` should be sized against the prefetch
+        count, so that batches fill without starving the other stages.
+
+        Args:
+            name (str): the name the stage's metrics are reported under
+            write (Callable[[list], Any]): writes a batch of items
+            batch_size (int): the number of items that triggers a write
+            max_pending (int): the maximum number of puts waiting to be written
+            max_puts (int): the number of waiting puts that triggers a write
+            flush_interval (float): seconds to wait before writing a partial batch
+            max_retries (int): the number of times a failed batch is retried
+            retry_delay (float): seconds before the first retry, doubled each time
+        """
+        self.write = write
+        self.batch_size = batch_size
+        self.max_puts = max_puts
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.metrics = StageMetrics(name)
+
+        self._queue = asyncio.Queue(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, items: list):
+        if not items:
+            return
+
+        written = asyncio.get_running_loop().create_future()
+        start = timeit.default_timer()
+        await self._queue.put((items, written))
+        self.metrics.blocked_time += timeit.default_timer() - start
+
+        await written
+
+    async def _next_batch(self) -> list[tuple[list, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = timeit.default_timer() + self.flush_interval
+        while size < self.batch_size and len(batch) < self.max_puts:
+            timeout = deadline - timeit.default_timer()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+            size += len(batch[-1][0])
+        return batch
+
+    async def _write_with_retries(self, items: list):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await loop.run_in_executor(self._executor, self.write, items)
+                return
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_delay * 2**attempt
+                logger.warning(
+                    "%s failed to write a batch of %s, retrying in %ss.",
+                    self.metrics.name,
+                    len(items),
+                    delay,
+                    exc_info=True,
+                )
+                await asyncio.sleep(delay)
+
+    async def _write_batch(self, batch: list[tuple[list, asyncio.Future]]):
+        items = [item for put_items, _ in batch for item in put_items]
+        start = timeit.default_timer()
+        try:
+            await self._write_with_retries(items)
+        except Exception as e:
+            logger.exception(
+                "%s failed to write a batch of %s.", self.metrics.name, len(items)
+            )
+            for _, written in batch:
+                if not written.done():  # a cancelled put is no longer waiting
+                    written.set_exception(e)
+        else:
+            self.metrics.processed += len(items)
+            for _, written in batch:
+                if not written.done():
+                    written.set_result(None)
+        finally:
+            self.metrics.busy_time += timeit.default_timer() - start
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            await self._write_batch(batch)
+
+    async def close(self):
+        """Write every queued item, then stop the writer."""
+        if self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+        self._executor.shutdown()
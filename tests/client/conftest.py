@@ -1,6 +1,6 @@
 import pytest
 import config
-from src.web.client import RateLimitedClient, ClientSettings
+from src.web.client import CachingClient, RateLimitedClient, ClientSettings
 
 
 @pytest.fixture
@@ -19,6 +19,17 @@ async def caching_client():
     await client.aclose()
 
 
+@pytest.fixture
+async def dedup_client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clientSettings: ClientSettings = ClientSettings(None, None)
+    client = CachingClient(
+        config.REQUEST_CACHE_LOCATION, clientSettings, near_duplicate_distance=3
+    )
+    yield client
+    await client.aclose()
+
+
 @pytest.fixture
 async def retry_client():
     clientSettings: ClientSettings = ClientSettings(None, None)
@@ -0,0 +1,121 @@
+import os
+
+import pytest
+import respx
+from httpx import Response
+
+from src.web.fingerprint import SimHashIndex, hamming_distance, simhash
+
+example_urls = [
+    "https://test.example.com/page",
+    "https://test.example.com/page?utm_source=newsletter",
+    "https://mirror.example.com/page",
+]
+
+example_body = " ".join(f"word{i}" for i in range(200))
+
+
+class TestDeduplication(object):
+    @respx.mock
+    @pytest.mark.anyio
+    async def test_exact_duplicates_share_blob(self, dedup_client):
+        """
+        Check that identical bodies under different URLs are only stored
+        once, and that later responses are marked as duplicates.
+        """
+        for url in example_urls:
+            respx.get(url).mock(return_value=Response(200, text=example_body))
+
+        responses = [await dedup_client.get(url) for url in example_urls]
+
+        assert responses[0].extensions["duplicate_of"] is None
+        assert responses[1].extensions["duplicate_of"] == example_urls[0]
+        assert responses[2].extensions["duplicate_of"] == example_urls[0]
+
+        stats = dedup_client.dedup_stats
+        assert stats.exact_duplicates == 2
+        assert stats.bytes_stored == len(example_body)
+        assert stats.bytes_saved == 2 * len(example_body)
+
+    @respx.mock
+    @pytest.mark.anyio
+    async def test_cached_response_keeps_body_and_marker(self, dedup_client):
+        for url in example_urls[::2]:
+            route = respx.get(url).mock(return_value=Response(200, text=example_body))
+
+        await dedup_client.get(example_urls[0])
+        await dedup_client.get(example_urls[2])
+        response = await dedup_client.get(example_urls[2])
+
+        assert route.call_count == 1
+        assert response.text == example_body
+        assert response.extensions["duplicate_of"] == example_urls[0]
+
+    @respx.mock
+    @pytest.mark.anyio
+    async def test_cache_hit_marked_as_duplicate(self, dedup_client):
+        """
+        Check that a URL served from the cache is marked as a duplicate of
+        itself, so that it isn't parsed (and stored) again.
+        """
+        respx.get(example_urls[0]).mock(return_value=Response(200, text=example_body))
+
+        first = await dedup_client.get(example_urls[0])
+        again = await dedup_client.get(example_urls[0])
+
+        assert first.extensions["duplicate_of"] is None
+        assert again.extensions["duplicate_of"] == example_urls[0]
+
+    @respx.mock
+    @pytest.mark.anyio
+    async def test_incomplete_blob_rewritten(self, dedup_client):
+        """
+        Check that a blob without its sidecar (e.g. from a worker that died
+        mid-write) is treated as unstored, rather than failing the request.
+        """
+        for url in example_urls[::2]:
+            respx.get(url).mock(return_value=Response(200, text=example_body))
+
+        await dedup_client.get(example_urls[0])
+        blob_location = dedup_client.blob_location
+        for filename in os.listdir(blob_location):
+            if filename.endswith(".json"):
+                os.remove(os.path.join(blob_location, filename))
+
+        response = await dedup_client.get(example_urls[2])
+
+        assert response.extensions["duplicate_of"] is None
+        assert response.text == example_body
+        assert not any(f.endswith(".tmp") for f in os.listdir(blob_location))
+
+    @respx.mock
+    @pytest.mark.anyio
+    async def test_near_duplicates_marked(self, dedup_client):
+        respx.get(example_urls[0]).mock(return_value=Response(200, text=example_body))
+        respx.get(example_urls[2]).mock(
+            return_value=Response(200, text=example_body + " Served by mirror.")
+        )
+
+        await dedup_client.get(example_urls[0])
+        response = await dedup_client.get(example_urls[2])
+
+        assert response.extensions["duplicate_of"] is None
+        assert response.extensions["near_duplicate_of"] == example_urls[0]
+        assert dedup_client.dedup_stats.near_duplicates == 1
+
+
+class TestSimHash(object):
+    def test_similar_texts_close(self):
+        a = simhash(example_body)
+        b = simhash(example_body + " Served by mirror.")
+        c = simhash(" ".join(f"other{i}" for i in range(200)))
+
+        assert hamming_distance(a, b) <= 3
+        assert hamming_distance(a, c) > 3
+
+    def test_index_query(self):
+        index = SimHashIndex(max_distance=3)
+        index.add(0b1011, "first")
+
+        assert index.query(0b1010) == "first"
+        assert index.query(0b0100 | 1 << 63) is None
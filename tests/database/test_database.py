@@ -1,6 +1,32 @@
 import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.database.models import Actor, Movie
+from src.database.store import add_movies
 
 
 @pytest.mark.anyio
 def test_database(dbsession):
     pass
+
+
+def test_store_idempotent(engine, tables):
+    """
+    Check that storing the same page twice doesn't duplicate its movies
+    or actors.
+    """
+    session_factory = sessionmaker(bind=engine)
+    records = [
+        {
+            "title": "Heat",
+            "release_date": "1995-12-15",
+            "actors": [{"name": "Al Pacino", "birthday": "1940-04-25"}],
+        }
+    ]
+
+    add_movies(session_factory, records)
+    add_movies(session_factory, records)
+
+    with session_factory() as session:
+        assert session.query(Movie).filter_by(title="Heat").count() == 1
+        assert session.query(Actor).filter_by(name="Al Pacino").count() == 1
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from src.web.frontier import FileCheckpointStore
+
+
+class RecordingTask(object):
+    """Stands in for a taskiq task, recording every URL it is sent."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def kiq(self, url):
+        await asyncio.sleep(0)  # yield, like a real send to the broker
+        self.sent.append(url)
+
+
+@pytest.fixture
+def recording_task():
+    return RecordingTask()
+
+
+@pytest.fixture
+def checkpoint_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return FileCheckpointStore("frontier/checkpoint")
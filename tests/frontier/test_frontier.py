@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from src.web.frontier import Frontier, ScalableBloomFilter, normalize_url
+
+
+class TestNormalization(object):
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "https://example.com/a?b=2&a=1",
+            "HTTPS://Example.COM/a?a=1&b=2",
+            "https://example.com:443/a?a=1&b=2#section",
+        ],
+    )
+    def test_equivalent_urls_normalize_equal(self, url):
+        assert normalize_url(url) == "https://example.com/a?a=1&b=2"
+
+    def test_non_default_port_kept(self):
+        assert normalize_url("http://example.com:8080") == "http://example.com:8080/"
+
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "http://[::1]:8080/x",
+            "https://example.com/?foo",
+            "https://example.com/?a=b;c&d=e%3Df",
+            "https://example.com/?a=1&a=0",
+        ],
+    )
+    def test_meaning_preserved(self, url):
+        assert normalize_url(url) == url
+
+    def test_repeated_keys_keep_order(self):
+        url = "https://example.com/?b=1&a=1&b=0"
+
+        assert normalize_url(url) == "https://example.com/?a=1&b=1&b=0"
+
+
+class TestBloomFilter(object):
+    def test_no_false_negatives(self):
+        seen = ScalableBloomFilter(initial_capacity=1000, error_rate=0.01)
+        urls = [f"https://example.com/{i}" for i in range(5000)]
+        for url in urls:
+            seen.add(url)
+
+        assert len(seen.filters) > 1
+        assert all(url in seen for url in urls)
+
+    def test_false_positive_rate_bounded(self):
+        """
+        Check that the measured false-positive rate stays below the
+        configured bound after the filter has grown several times.
+        """
+        seen = ScalableBloomFilter(initial_capacity=1000, error_rate=0.01)
+        for i in range(10000):
+            seen.add(f"https://example.com/{i}")
+
+        trials = 10000
+        false_positives = sum(
+            f"https://another.one.com/{i}" in seen for i in range(trials)
+        )
+
+        assert false_positives / trials < 0.01
+        assert seen.false_positive_rate < 0.01
+
+    def test_round_trip(self):
+        seen = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+        for i in range(500):
+            seen.add(str(i))
+
+        restored = ScalableBloomFilter.from_bytes(seen.to_bytes())
+
+        assert len(restored) == len(seen)
+        assert restored.memory == seen.memory
+        assert all(str(i) in restored for i in range(500))
+
+
+class TestFrontier(object):
+    @pytest.mark.anyio
+    async def test_duplicates_dropped(self, recording_task):
+        frontier = Frontier(recording_task, batch_size=10)
+
+        assert await frontier.add("https://example.com/a")
+        assert not await frontier.add("HTTPS://example.com/a#top")
+        await frontier.flush()
+
+        assert recording_task.sent == ["https://example.com/a"]
+        assert frontier.stats()["duplicates"] == 1
+
+    @pytest.mark.anyio
+    async def test_concurrent_adds_enqueued_once(self, recording_task):
+        """
+        Check that overlapping flushes don't send the same batch twice,
+        or drop URLs that were never sent.
+        """
+        frontier = Frontier(recording_task, batch_size=3)
+        urls = [f"https://example.com/{i}" for i in range(9)]
+
+        await asyncio.gather(*(frontier.add(url) for url in urls))
+        await frontier.flush()
+
+        assert sorted(recording_task.sent) == sorted(urls)
+        assert frontier.stats()["enqueued"] == 9
+
+    @pytest.mark.anyio
+    async def test_malformed_url_rejected(self, recording_task):
+        frontier = Frontier(recording_task, batch_size=10)
+
+        added = await frontier.extend(["http://x:abc/", "https://example.com/a"])
+        await frontier.flush()
+
+        assert added == 1
+        assert recording_task.sent == ["https://example.com/a"]
+        assert frontier.stats()["rejected"] == 1
+
+    @pytest.mark.anyio
+    async def test_enqueued_in_batches(self, recording_task):
+        frontier = Frontier(recording_task, batch_size=3)
+
+        await frontier.extend(f"https://example.com/{i}" for i in range(5))
+
+        assert len(recording_task.sent) == 3
+        assert len(frontier.pending) == 2
+
+        await frontier.flush()
+
+        assert len(recording_task.sent) == 5
+        assert not frontier.pending
+
+    @pytest.mark.anyio
+    async def test_resume_from_checkpoint(self, recording_task, checkpoint_store):
+        """
+        Check that a restarted frontier keeps both the seen URLs and
+        the URLs that were buffered but never enqueued.
+        """
+        frontier = Frontier(recording_task, checkpoint_store, batch_size=3)
+        await frontier.extend(f"https://example.com/{i}" for i in range(4))
+        await frontier.checkpoint()
+
+        restarted = Frontier(recording_task, checkpoint_store, batch_size=3)
+
+        assert await restarted.resume()
+        assert restarted.pending == ["https://example.com/3"]
+        assert not await restarted.add("https://example.com/0")
@@ -0,0 +1,55 @@
+import pytest
+
+from src.worker.lanes import LaneMetricsMiddleware
+
+
+class FakePipeline(object):
+    """Queues commands, running them against the FakeRedis on execute."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+        return lambda *args, **kwargs: self.commands.append(command(*args, **kwargs))
+
+    async def execute(self):
+        return [await command for command in self.commands]
+
+
+class FakeRedis(object):
+    """Just enough of the redis commands for the lane metrics."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.keys = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.keys:
+            return None
+        self.keys[name] = value
+        return True
+
+    async def hincrby(self, name, key, amount=1):
+        values = self.hashes.setdefault(name, {})
+        values[key] = values.get(key, 0) + amount
+
+    async def hset(self, name, key, value):
+        self.hashes.setdefault(name, {})[key] = value
+
+
+@pytest.fixture
+def lane_middleware():
+    middleware = LaneMetricsMiddleware("redis://localhost")
+    middleware.redis = FakeRedis()
+    return middleware
@@ -0,0 +1,81 @@
+import pytest
+from taskiq import TaskiqMessage
+
+import config
+from src.worker.lanes import DEPTH_KEY, LAG_KEY
+
+
+def make_message(**labels):
+    return TaskiqMessage(
+        task_id="1",
+        task_name="make_request",
+        labels=labels,
+        args=["https://httpbin.org/get"],
+        kwargs={},
+    )
+
+
+class TestLanes(object):
+    def test_default_lane(self, lane_middleware):
+        message = lane_middleware.pre_send(make_message())
+
+        assert message.labels["lane"] == config.DEFAULT_TASK_LANE
+        assert message.labels["priority"] == str(config.TASK_LANES["default"])
+
+    def test_urgent_lane_prioritised(self, lane_middleware):
+        urgent = lane_middleware.pre_send(make_message(lane="urgent"))
+        bulk = lane_middleware.pre_send(make_message(lane="bulk"))
+
+        assert int(urgent.labels["priority"]) > int(bulk.labels["priority"])
+
+    @pytest.mark.anyio
+    async def test_depth_and_lag_tracked(self, lane_middleware):
+        """
+        Check that sending a task raises the lane's depth, and that
+        executing it lowers the depth again and records its lag.
+        """
+        message = lane_middleware.pre_send(make_message(lane="urgent"))
+        await lane_middleware.post_send(message)
+
+        assert lane_middleware.redis.hashes[DEPTH_KEY]["urgent"] == 1
+
+        await lane_middleware.pre_execute(message)
+
+        assert lane_middleware.redis.hashes[DEPTH_KEY]["urgent"] == 0
+        assert lane_middleware.redis.hashes[LAG_KEY]["urgent"] >= 0
+
+    def test_explicit_priority_kept(self, lane_middleware):
+        message = lane_middleware.pre_send(make_message(lane="bulk", priority="7"))
+
+        assert message.labels["priority"] == "7"
+
+    @pytest.mark.anyio
+    async def test_redelivery_counted_once(self, lane_middleware):
+        """
+        Check that a message delivered twice (e.g. after a worker crash)
+        only lowers its lane's depth once.
+        """
+        message = lane_middleware.pre_send(make_message(lane="urgent"))
+        await lane_middleware.post_send(message)
+
+        await lane_middleware.pre_execute(message)
+        await lane_middleware.pre_execute(message)
+
+        assert lane_middleware.redis.hashes[DEPTH_KEY]["urgent"] == 0
+
+    def test_unknown_lane_falls_back(self, lane_middleware):
+        message = lane_middleware.pre_send(make_message(lane="nonexistent"))
+
+        assert message.labels["lane"] == config.DEFAULT_TASK_LANE
+        assert message.labels["priority"] == str(config.TASK_LANES["default"])
+
+    @pytest.mark.anyio
+    async def test_untracked_message_not_counted(self, lane_middleware):
+        """
+        Check that messages sent without this middleware don't lower the
+        depth of any lane.
+        """
+        await lane_middleware.pre_execute(make_message(lane="urgent"))
+        await lane_middleware.pre_execute(make_message())
+
+        assert DEPTH_KEY not in lane_middleware.redis.hashes
@@ -0,0 +1,95 @@
+import json
+import logging
+
+import pytest
+
+from src.worker import log
+from src.worker.log import JsonFormatter, SamplingFilter
+
+
+def make_record(name, level=logging.INFO, msg="Request to %s failed.", args=("x",)):
+    return logging.LogRecord(name, level, __file__, 0, msg, args, None)
+
+
+class TestSampling(object):
+    def test_unsampled_logger_kept(self):
+        sampler = SamplingFilter({"src.web.client": 0.0})
+
+        assert sampler.filter(make_record("src.worker.broker"))
+
+    def test_sampled_logger_dropped(self):
+        """
+        Check that child loggers inherit the sample rate of their parent.
+        """
+        sampler = SamplingFilter({"src.web": 0.0})
+
+        assert not sampler.filter(make_record("src.web.client"))
+
+    def test_parent_logger_kept(self):
+        """
+        Check that sampling a child logger leaves its parent's records alone.
+        """
+        sampler = SamplingFilter({"src.web.client.timing": 0.0})
+
+        assert sampler.filter(make_record("src.web.client"))
+        assert not sampler.filter(make_record("src.web.client.timing"))
+
+    def test_warnings_never_dropped(self):
+        sampler = SamplingFilter({"src.web.client": 0.0})
+
+        assert sampler.filter(make_record("src.web.client", logging.WARNING))
+
+
+def test_json_output():
+    line = JsonFormatter().format(make_record("src.web.client"))
+    data = json.loads(line)
+
+    assert data["logger"] == "src.web.client"
+    assert data["level"] == "INFO"
+    assert data["message"] == "Request to x failed."
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Log to a temporary file, restoring the usual logging afterwards."""
+    was_configured = log._listener is not None
+    log.stop_logging()
+    filename = tmp_path / "main.log"
+    yield str(filename)
+    log.stop_logging()
+    if was_configured:
+        log.configure_logging()
+
+
+def read_records(filename):
+    with open(filename, "r") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_exception_logged_as_field(log_file):
+    """
+    Check that a traceback logged through the queue is written as its own
+    field, rather than being folded into the message.
+    """
+    log.configure_logging(log_file, "INFO", {})
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("tests").exception("Failed %s.", 1)
+    log.stop_logging()
+
+    (record,) = read_records(log_file)
+    assert record["message"] == "Failed 1."
+    assert "ValueError: boom" in record["exception"]
+
+
+def test_configure_logging_idempotent(log_file):
+    listener = log.configure_logging(log_file, "INFO", {})
+
+    assert log.configure_logging(log_file, "INFO", {}) is listener
+
+    logging.getLogger("tests").info("Once.")
+    log.stop_logging()
+
+    assert len(read_records(log_file)) == 1
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from src.web.parse import parse_movies
+from src.worker.stages import BatchWriter, Stage
+
+example_page = """
+<div class="movie" data-title="Heat" data-release-date="1995-12-15">
+    <span class="actor" data-name="Al Pacino" data-birthday="1940-04-25"></span>
+    <span class="actor" data-name="Robert De Niro" data-birthday="1943-08-17"></span>
+</div>
+<div class="movie" data-title="Ronin" data-release-date="1998-09-25">
+    <span class="actor" data-name="Robert De Niro" data-birthday="1943-08-17"></span>
+</div>
+"""
+
+
+def test_parse_movies():
+    movies = parse_movies(example_page)
+
+    assert [movie["title"] for movie in movies] == ["Heat", "Ronin"]
+    assert len(movies[0]["actors"]) == 2
+    assert movies[1]["actors"][0]["name"] == "Robert De Niro"
+
+
+def test_parse_skips_incomplete_records():
+    page = """
+    <div class="movie" data-title="Undated"></div>
+    <span class="actor" data-name="Nobody" data-birthday="1950-01-01"></span>
+    <div class="movie" data-title="Heat" data-release-date="1995-12-15">
+        <span class="actor" data-name="Al Pacino"></span>
+        <span class="actor" data-name="Val Kilmer" data-birthday="1959-12-31"></span>
+    </div>
+    """
+
+    movies = parse_movies(page)
+
+    assert [movie["title"] for movie in movies] == ["Heat"]
+    assert [actor["name"] for actor in movies[0]["actors"]] == ["Val Kilmer"]
+
+
+class TestStages(object):
+    @pytest.mark.anyio
+    async def test_stage_bounded(self):
+        """
+        Check that no more than max_pending items are ever in a stage,
+        and that the items kept waiting are counted as blocked time.
+        """
+        stage = Stage("parse", max_pending=2)
+        in_stage = 0
+        most_in_stage = 0
+
+        async def process():
+            nonlocal in_stage, most_in_stage
+            async with stage.slot():
+                in_stage += 1
+                most_in_stage = max(most_in_stage, in_stage)
+                await asyncio.sleep(0.05)
+                in_stage -= 1
+
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(6):
+                tg.create_task(process())
+
+        assert most_in_stage == 2
+        assert stage.metrics.processed == 6
+        assert stage.metrics.blocked_time > 0
+
+    @pytest.mark.anyio
+    async def test_writer_batches(self):
+        """
+        Check that puts are batched together until the batch is full, and
+        that a put is never split across batches.
+        """
+        batches = []
+        writer = BatchWriter("store", batches.append, batch_size=4, flush_interval=0.05)
+        writer.start()
+
+        await asyncio.gather(*(writer.put([i] * 3) for i in range(3)))
+        await writer.put(list(range(10)))
+        await writer.close()
+
+        assert [len(batch) for batch in batches] == [6, 3, 10]
+        assert writer.metrics.processed == 19
+
+    @pytest.mark.anyio
+    async def test_writer_flushes_on_waiting_puts(self):
+        """
+        Check that a batch is written once max_puts puts are waiting, without
+        waiting out the flush interval.
+        """
+        batches = []
+        writer = BatchWriter(
+            "store", batches.append, batch_size=100, max_puts=2, flush_interval=60
+        )
+        writer.start()
+
+        await asyncio.wait_for(
+            asyncio.gather(writer.put([1]), writer.put([2])), timeout=1
+        )
+        await writer.close()
+
+        assert batches == [[1, 2]]
+
+    @pytest.mark.anyio
+    async def test_writer_retries_failed_batch(self):
+        batches = []
+        failures = [ConnectionError("connection dropped")]
+
+        def write(batch):
+            if failures:
+                raise failures.pop()
+            batches.append(batch)
+
+        writer = BatchWriter(
+            "store", write, flush_interval=0.01, max_retries=1, retry_delay=0.01
+        )
+        writer.start()
+
+        await writer.put([1, 2, 3])
+        await writer.close()
+
+        assert batches == [[1, 2, 3]]
+        assert writer.metrics.processed == 3
+
+    @pytest.mark.anyio
+    async def test_writer_surfaces_failure(self):
+        """
+        Check that once retries run out, put raises instead of the batch
+        being silently dropped.
+        """
+
+        def write(batch):
+            raise ConnectionError("connection dropped")
+
+        writer = BatchWriter(
+            "store", write, flush_interval=0.01, max_retries=1, retry_delay=0.01
+        )
+        writer.start()
+
+        with pytest.raises(ConnectionError):
+            await writer.put([1, 2, 3])
+        await writer.close()
+
+        assert writer.metrics.processed == 0